@@ -0,0 +1,127 @@
+"""
+Leitura rápida do arquivo de configuração (config.ini).
+
+O config.ini do sistema é um INI simples (seções e pares chave = valor).
+Para esse formato, um leitor linha a linha é bem mais rápido que o
+ConfigParser e evita importá-lo na inicialização (relevante no executável
+gerado pelo PyInstaller). Arquivos com recursos avançados (continuação de
+linha, interpolação, seção DEFAULT, delimitador ':') caem no ConfigParser.
+"""
+
+import os
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+if TYPE_CHECKING:
+    # Só para a anotação de tipo; o ConfigParser é importado sob demanda
+    from configparser import ConfigParser
+
+
+class ConfigINI:
+    """
+    Configuração já carregada, com a mesma interface de leitura do ConfigParser
+    usada no projeto (get, getint, has_option, has_section, sections).
+    """
+    
+    def __init__(self, secoes: Optional[Dict[str, Dict[str, str]]] = None):
+        """
+        Args:
+            secoes: Dicionário {secao: {chave: valor}} (chaves em minúsculas).
+        """
+        self._secoes = secoes or {}
+    
+    def sections(self) -> list:
+        """Retorna a lista de seções."""
+        return list(self._secoes)
+    
+    def has_section(self, secao: str) -> bool:
+        """Verifica se a seção existe."""
+        return secao in self._secoes
+    
+    def has_option(self, secao: str, chave: str) -> bool:
+        """Verifica se a chave existe na seção."""
+        return chave.lower() in self._secoes.get(secao, {})
+    
+    def get(self, secao: str, chave: str, fallback: Optional[str] = None) -> Optional[str]:
+        """Retorna o valor da chave ou o fallback se não existir."""
+        return self._secoes.get(secao, {}).get(chave.lower(), fallback)
+    
+    def getint(self, secao: str, chave: str, fallback: Optional[int] = None) -> Optional[int]:
+        """Retorna o valor da chave convertido para int ou o fallback se não existir."""
+        valor = self.get(secao, chave)
+        if valor is None:
+            return fallback
+        return int(valor)
+
+
+def _ler_ini_rapido(config_path: str) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Lê um INI simples linha a linha.
+    
+    Args:
+        config_path: Caminho do arquivo.
+    
+    Returns:
+        Dicionário {secao: {chave: valor}} ou None se o arquivo usar sintaxe
+        que só o ConfigParser trata corretamente.
+    """
+    secoes: Dict[str, Dict[str, str]] = {}
+    secao_atual = None
+    
+    with open(config_path, 'r', encoding='utf-8') as f:
+        for linha in f:
+            conteudo = linha.strip()
+            
+            # Linhas vazias e comentários
+            if not conteudo or conteudo[0] in '#;':
+                continue
+            
+            # Continuação de linha (valor em várias linhas)
+            if linha[0] in ' \t':
+                return None
+            
+            if conteudo[0] == '[' and conteudo[-1] == ']':
+                secao_atual = conteudo[1:-1]
+                if secao_atual == 'DEFAULT' or secao_atual in secoes:
+                    return None
+                secoes[secao_atual] = {}
+                continue
+            
+            if secao_atual is None or '=' not in conteudo or '%' in conteudo:
+                return None
+            
+            chave, valor = conteudo.split('=', 1)
+            chave = chave.strip().lower()
+            if ':' in chave or chave in secoes[secao_atual]:
+                return None
+            
+            secoes[secao_atual][chave] = valor.strip()
+    
+    return secoes
+
+
+def carregar_config(config_path: str) -> Union[ConfigINI, 'ConfigParser']:
+    """
+    Carrega o arquivo de configuração.
+    
+    Args:
+        config_path: Caminho do arquivo de configuração.
+    
+    Returns:
+        ConfigINI com as seções lidas (vazio se o arquivo não existir), ou o
+        próprio ConfigParser se o arquivo usar sintaxe avançada.
+    """
+    if not os.path.exists(config_path):
+        return ConfigINI()
+    
+    secoes = _ler_ini_rapido(config_path)
+    
+    if secoes is None:
+        # Sintaxe avançada: devolve o ConfigParser, que interpola cada valor só
+        # quando é lido (um '%' inválido não afeta as outras chaves)
+        from configparser import ConfigParser
+        
+        config = ConfigParser()
+        config.read(config_path, encoding='utf-8')
+        return config
+    
+    return ConfigINI(secoes)
@@ -8,9 +8,10 @@ import os
 import sys
 import re
 from datetime import datetime
-from configparser import ConfigParser
 from typing import List, Optional, Tuple
 
+from config_utils import carregar_config
+
 
 def get_config_path():
     """
@@ -70,12 +71,8 @@ class SFTPClient:
         if config_path is None:
             config_path = get_config_path()
         
-        self.config = ConfigParser()
-        config_loaded = False
-        
-        if os.path.exists(config_path):
-            self.config.read(config_path, encoding='utf-8')
-            config_loaded = True
+        self.config = carregar_config(config_path)
+        config_loaded = os.path.exists(config_path)
         
         # Configurações SFTP (variáveis de ambiente têm prioridade)
         self.host = os.environ.get('SFTP_HOST') or (
@@ -697,6 +694,8 @@ def carregar_configuracao(config_path: str = "config.ini") -> dict:
     Returns:
         Dicionário com as configurações.
     """
+    from configparser import ConfigParser
+    
     config = ConfigParser()
     config.read(config_path, encoding='utf-8')
     
@@ -10,14 +10,29 @@ import sys
 import threading
 import zipfile
 import socket
-import configparser
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
+from config_utils import carregar_config
 from ftp_client import SFTPClient, get_config_path
 from nfse_client import NFSeClient
 
 
+# Quantidade de NFSe consultadas ao mesmo tempo na API SEFIN
+MAX_CONSULTAS_NFSE_PARALELAS = 4
+
+# Abre arquivos/pastas com o programa padrão do sistema (resolvido uma vez).
+# Popen não espera o processo filho, evitando travar a interface.
+if sys.platform == 'win32':
+    _abrir_com_sistema = os.startfile
+else:
+    _COMANDO_ABRIR = 'open' if sys.platform == 'darwin' else 'xdg-open'
+    
+    def _abrir_com_sistema(caminho: str):
+        subprocess.Popen([_COMANDO_ABRIR, caminho])
+
+
 class BuscaBoletoApp:
     """Aplicação principal para busca de boletos."""
     
@@ -40,6 +55,9 @@ class BuscaBoletoApp:
         # Cliente NFSe
         self.nfse_client: Optional[NFSeClient] = None
         
+        # Sinaliza o fechamento da janela para as consultas NFSe em andamento
+        self.encerrando = threading.Event()
+        
         # Lista de resultados da busca
         self.resultados_busca = []
         
@@ -381,8 +399,7 @@ class BuscaBoletoApp:
         try:
             config_path = get_config_path()
             if config_path and os.path.exists(config_path):
-                config = configparser.ConfigParser()
-                config.read(config_path, encoding='utf-8')
+                config = carregar_config(config_path)
                 
                 if config.has_option('SEGURANCA', 'faixas_ip_permitidas'):
                     faixas = config.get('SEGURANCA', 'faixas_ip_permitidas').strip()
@@ -1123,68 +1140,95 @@ class BuscaBoletoApp:
             xmls_encontrados = 0
             erros = []
             
-            for i, numero in enumerate(numeros):
-                self.root.after(0, lambda n=numero, idx=i, total=len(numeros): 
-                    self.atualizar_status(f"Buscando XML NFSe {idx+1}/{total} (nº {n})..."))
+            def processar_numero(numero):
+                """Busca XML e PDF de uma NFSe. Retorna (xml_encontrado, erros)."""
+                erros_numero = []
                 
-                try:
-                    sucesso, resultado, info = self.nfse_client.buscar_e_salvar_xml_nfse(numero)
+                # Janela fechada: não inicia novas consultas
+                if self.encerrando.is_set():
+                    return False, erros_numero
+                
+                sucesso, resultado, info = self.nfse_client.buscar_e_salvar_xml_nfse(numero)
+                
+                if sucesso:
+                    caminho_xml = resultado
                     
-                    if sucesso:
-                        caminho_xml = resultado
-                        xmls_encontrados += 1
-                        
-                        # Extrai o nome do cliente do XML
-                        nome_cliente = self._extrair_nome_cliente_xml(caminho_xml)
-                        
-                        # Extrai a data de emissão do XML
-                        data_emissao = self._extrair_data_emissao_xml(caminho_xml)
-                        
-                        # Baixa o PDF diretamente da API (usando a chave de acesso)
-                        caminho_pdf = None
-                        chave_acesso = info.get('chave_acesso', '')
-                        if chave_acesso:
-                            try:
-                                sucesso_pdf, resultado_pdf = self.nfse_client.baixar_pdf_nfse(chave_acesso, numero)
-                                if sucesso_pdf:
-                                    caminho_pdf = resultado_pdf
-                            except Exception as e_pdf:
-                                erros.append(f"PDF NFSe {numero}: {str(e_pdf)}")
+                    # Extrai o nome do cliente e a data de emissão do XML
+                    nome_cliente, data_emissao = self._extrair_dados_xml_nfse(caminho_xml)
+                    
+                    # Baixa o PDF diretamente da API (usando a chave de acesso)
+                    caminho_pdf = None
+                    chave_acesso = info.get('chave_acesso', '')
+                    if chave_acesso and not self.encerrando.is_set():
+                        try:
+                            sucesso_pdf, resultado_pdf = self.nfse_client.baixar_pdf_nfse(chave_acesso, numero)
+                            if sucesso_pdf:
+                                caminho_pdf = resultado_pdf
+                        except Exception as e_pdf:
+                            erros_numero.append(f"PDF NFSe {numero}: {str(e_pdf)}")
+                    
+                    # Adiciona o XML e PDF na lista de resultados (na thread principal)
+                    def adicionar_xml_pdf(num=numero, path_xml=caminho_xml, path_pdf=caminho_pdf, cliente=nome_cliente, data_xml=data_emissao):
+                        # Encontra o grupo correspondente e adiciona após o último item do grupo
+                        indice_inserir = None
+                        for item_id in self.tree_resultados.get_children(''):
+                            valores = self.tree_resultados.item(item_id)['values']
+                            if valores[1] != '───' and str(valores[2]) == str(num):
+                                # Encontrou um item com o mesmo número
+                                indice_inserir = self.tree_resultados.index(item_id) + 1
+                                break
                         
-                        # Adiciona o XML e PDF na lista de resultados (na thread principal)
-                        def adicionar_xml_pdf(num=numero, path_xml=caminho_xml, path_pdf=caminho_pdf, cliente=nome_cliente, data_xml=data_emissao):
-                            # Encontra o grupo correspondente e adiciona após o último item do grupo
-                            indice_inserir = None
-                            for item_id in self.tree_resultados.get_children(''):
-                                valores = self.tree_resultados.item(item_id)['values']
-                                if valores[1] != '───' and str(valores[2]) == str(num):
-                                    # Encontrou um item com o mesmo número
-                                    indice_inserir = self.tree_resultados.index(item_id) + 1
-                                    break
+                        if indice_inserir is not None:
+                            # Insere o XML
+                            nome_xml = os.path.basename(path_xml)
+                            self.tree_resultados.insert('', indice_inserir,
+                                values=('☐', 'XML', num, cliente, data_xml, nome_xml, path_xml), 
+                                tags=('xml',))
                             
-                            if indice_inserir is not None:
-                                # Insere o XML
-                                nome_xml = os.path.basename(path_xml)
-                                self.tree_resultados.insert('', indice_inserir,
-                                    values=('☐', 'XML', num, cliente, data_xml, nome_xml, path_xml), 
-                                    tags=('xml',))
-                                
-                                # Insere o PDF (se foi baixado com sucesso)
-                                if path_pdf and os.path.exists(path_pdf):
-                                    nome_pdf = os.path.basename(path_pdf)
-                                    self.tree_resultados.insert('', indice_inserir + 1,
-                                        values=('☐', 'PDF-XML', num, cliente, data_xml, nome_pdf, path_pdf), 
-                                        tags=('pdf_xml',))
-                            
-                            # Atualiza contagem
-                            self._atualizar_contagem_com_xml()
-                        
-                        self.root.after(0, adicionar_xml_pdf)
-                    else:
-                        erros.append(f"NFSe {numero}: {resultado}")
+                            # Insere o PDF (se foi baixado com sucesso)
+                            if path_pdf and os.path.exists(path_pdf):
+                                nome_pdf = os.path.basename(path_pdf)
+                                self.tree_resultados.insert('', indice_inserir + 1,
+                                    values=('☐', 'PDF-XML', num, cliente, data_xml, nome_pdf, path_pdf), 
+                                    tags=('pdf_xml',))
                         
-                except Exception as e:
-                    erros.append(f"NFSe {numero}: {str(e)}")
+                        # Atualiza contagem
+                        self._atualizar_contagem_com_xml()
+                    
+                    self.root.after(0, adicionar_xml_pdf)
+                else:
+                    erros_numero.append(f"NFSe {numero}: {resultado}")
+                
+                return sucesso, erros_numero
+            
+            # As etapas de cada número (DPS -> chave -> XML -> PDF) são sequenciais,
+            # mas números diferentes são consultados em paralelo na mesma sessão HTTPS
+            total = len(numeros)
+            self.root.after(0, lambda: self.atualizar_status(f"Buscando XML NFSe de {total} documento(s)..."))
+            
+            # As threads do pool não são daemon: ao fechar a janela, os números ainda na
+            # fila são cancelados para o processo não esperar todas as consultas
+            executor = ThreadPoolExecutor(max_workers=MAX_CONSULTAS_NFSE_PARALELAS)
+            try:
+                futuros = {executor.submit(processar_numero, numero): numero for numero in numeros}
+                
+                for i, futuro in enumerate(as_completed(futuros), 1):
+                    if self.encerrando.is_set():
+                        return
+                    
+                    numero = futuros[futuro]
+                    try:
+                        encontrado, erros_numero = futuro.result()
+                        if encontrado:
+                            xmls_encontrados += 1
+                        erros.extend(erros_numero)
+                    except Exception as e:
+                        erros.append(f"NFSe {numero}: {str(e)}")
+                    
+                    self.root.after(0, lambda n=numero, idx=i: 
+                        self.atualizar_status(f"Buscando XML NFSe {idx}/{total} (nº {n} concluído)..."))
+            finally:
+                executor.shutdown(cancel_futures=True)
             
             # Finaliza
             def finalizar():
@@ -1203,121 +1247,97 @@ class BuscaBoletoApp:
         thread.daemon = True
         thread.start()
     
-    def _extrair_nome_cliente_xml(self, caminho_xml: str) -> str:
+    def _extrair_dados_xml_nfse(self, caminho_xml: str) -> Tuple[str, str]:
         """
-        Extrai o nome do cliente da tag <xNome> dentro de <toma> do XML da NFSe.
+        Extrai o nome do cliente (<toma>/<xNome>) e a data de emissão
+        (<infDPS>/<dhEmi>) do XML da NFSe em uma única leitura do arquivo.
         
         Args:
             caminho_xml: Caminho do arquivo XML.
             
         Returns:
-            Nome do cliente ou '-' se não encontrar.
+            Tupla (nome_cliente, data_emissao); '-' para o que não encontrar.
+            A data vem formatada como DD/MM/AAAA HH:MM.
         """
         try:
             import xml.etree.ElementTree as ET
             
-            # Lê o arquivo XML
-            tree = ET.parse(caminho_xml)
-            root = tree.getroot()
-            
-            # Procura pelo elemento tomador (toma, Tomador, etc)
-            tomador = None
-            for elem in root.iter():
-                tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag_name.lower() in ('toma', 'tomador', 'dest'):
-                    tomador = elem
-                    break
-            
-            # Se encontrou o tomador, busca xNome dentro dele
-            if tomador is not None:
-                for elem in tomador.iter():
-                    tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                    if tag_name == 'xNome' and elem.text:
-                        return elem.text.strip()[:50]
+            nome_cliente = None
+            data_emissao = None
+            dentro_tomador = 0
+            dentro_inf_dps = 0
+            
+            # Percorre o XML uma vez, sem montar a árvore inteira
+            for evento, elem in ET.iterparse(caminho_xml, events=('start', 'end')):
+                tag_name = elem.tag.rpartition('}')[2]
+                
+                if evento == 'start':
+                    if tag_name.lower() in ('toma', 'tomador', 'dest'):
+                        dentro_tomador += 1
+                    elif tag_name == 'infDPS':
+                        dentro_inf_dps += 1
+                    continue
+                
+                if tag_name == 'xNome':
+                    if dentro_tomador and nome_cliente is None and elem.text:
+                        nome_cliente = elem.text.strip()[:50]
+                elif tag_name == 'dhEmi':
+                    if dentro_inf_dps and data_emissao is None and elem.text:
+                        data_emissao = self._formatar_data_emissao(elem.text)
+                elif tag_name.lower() in ('toma', 'tomador', 'dest'):
+                    dentro_tomador -= 1
+                elif tag_name == 'infDPS':
+                    dentro_inf_dps -= 1
+                
+                elem.clear()
+                
+                if nome_cliente is not None and data_emissao is not None:
+                    return nome_cliente, data_emissao
             
             # Fallback: busca pelo texto do XML diretamente (regex)
             with open(caminho_xml, 'r', encoding='utf-8') as f:
                 conteudo = f.read()
             
             import re
-            # Busca xNome dentro de toma/tomador/dest
-            match = re.search(r'<[^>]*(?:toma|Tomador|dest)[^>]*>.*?<[^:]*:?xNome>([^<]+)</[^:]*:?xNome>', conteudo, re.IGNORECASE | re.DOTALL)
-            if match:
-                return match.group(1).strip()[:50]
+            if nome_cliente is None:
+                # Busca xNome dentro de toma/tomador/dest
+                match = re.search(r'<[^>]*(?:toma|Tomador|dest)[^>]*>.*?<[^:]*:?xNome>([^<]+)</[^:]*:?xNome>', conteudo, re.IGNORECASE | re.DOTALL)
+                if match:
+                    nome_cliente = match.group(1).strip()[:50]
+            
+            if data_emissao is None:
+                # Busca dhEmi dentro de infDPS
+                match = re.search(r'<[^>]*infDPS[^>]*>.*?<[^:]*:?dhEmi>([^<]+)</[^:]*:?dhEmi>', conteudo, re.IGNORECASE | re.DOTALL)
+                if match:
+                    data_emissao = self._formatar_data_emissao(match.group(1))
             
-            return '-'
+            return nome_cliente or '-', data_emissao or '-'
             
         except Exception as e:
-            return '-'
+            return '-', '-'
     
-    def _extrair_data_emissao_xml(self, caminho_xml: str) -> str:
+    def _formatar_data_emissao(self, data_str: str) -> str:
         """
-        Extrai a data de emissão da tag <dhEmi> dentro de <infDPS> do XML da NFSe.
+        Formata a data de emissão do XML (ex: 2025-12-12T10:30:00 -> 12/12/2025 10:30).
         
         Args:
-            caminho_xml: Caminho do arquivo XML.
+            data_str: Data no formato ISO, com ou sem timezone.
             
         Returns:
-            Data formatada (DD/MM/AAAA HH:MM) ou '-' se não encontrar.
+            Data formatada ou o texto original (até 16 caracteres) se não for ISO.
         """
+        data_str = data_str.strip()
         try:
-            import xml.etree.ElementTree as ET
-            
-            # Lê o arquivo XML
-            tree = ET.parse(caminho_xml)
-            root = tree.getroot()
-            
-            # Procura pelo elemento infDPS
-            inf_dps = None
-            for elem in root.iter():
-                tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                if tag_name == 'infDPS':
-                    inf_dps = elem
-                    break
-            
-            # Se encontrou o infDPS, busca dhEmi dentro dele
-            if inf_dps is not None:
-                for elem in inf_dps.iter():
-                    tag_name = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-                    if tag_name == 'dhEmi' and elem.text:
-                        # Formata a data (ex: 2025-12-12T10:30:00 -> 12/12/2025 10:30)
-                        data_str = elem.text.strip()
-                        try:
-                            # Remove timezone se houver
-                            if '+' in data_str:
-                                data_str = data_str.split('+')[0]
-                            elif 'Z' in data_str:
-                                data_str = data_str.replace('Z', '')
-                            
-                            dt = datetime.fromisoformat(data_str)
-                            return dt.strftime("%d/%m/%Y %H:%M")
-                        except:
-                            return data_str[:16] if len(data_str) >= 16 else data_str
-            
-            # Fallback: busca pelo texto do XML diretamente (regex)
-            with open(caminho_xml, 'r', encoding='utf-8') as f:
-                conteudo = f.read()
-            
-            import re
-            # Busca dhEmi dentro de infDPS
-            match = re.search(r'<[^>]*infDPS[^>]*>.*?<[^:]*:?dhEmi>([^<]+)</[^:]*:?dhEmi>', conteudo, re.IGNORECASE | re.DOTALL)
-            if match:
-                data_str = match.group(1).strip()
-                try:
-                    if '+' in data_str:
-                        data_str = data_str.split('+')[0]
-                    elif 'Z' in data_str:
-                        data_str = data_str.replace('Z', '')
-                    
-                    dt = datetime.fromisoformat(data_str)
-                    return dt.strftime("%d/%m/%Y %H:%M")
-                except:
-                    return data_str[:16] if len(data_str) >= 16 else data_str
-            
-            return '-'
-            
-        except Exception as e:
-            return '-'
+            # Remove timezone se houver
+            if '+' in data_str:
+                data_str = data_str.split('+')[0]
+            elif 'Z' in data_str:
+                data_str = data_str.replace('Z', '')
+            
+            dt = datetime.fromisoformat(data_str)
+            return dt.strftime("%d/%m/%Y %H:%M")
+        except:
+            return data_str[:16] if len(data_str) >= 16 else data_str
     
     def _atualizar_contagem_com_xml(self):
         """Atualiza a contagem incluindo XMLs e PDFs."""
@@ -1770,11 +1790,11 @@ class BuscaBoletoApp:
         if tipo in ('XML', 'PDF-XML'):
             if os.path.exists(caminho):
                 self.atualizar_status(f"Arquivo {tipo} já disponível: {caminho}")
-                if messagebox.askyesno(
+                self._perguntar_abrir_async(
                     f"Arquivo {tipo}",
-                    f"O arquivo '{nome}' já está salvo em:\n\n{caminho}\n\nDeseja abrir o arquivo?"
-                ):
-                    self.abrir_arquivo(caminho)
+                    f"O arquivo '{nome}' já está salvo em:\n\n{caminho}\n\nDeseja abrir o arquivo?",
+                    lambda: self.abrir_arquivo(caminho)
+                )
             else:
                 messagebox.showerror("Erro", f"Arquivo {tipo} não encontrado: {caminho}")
             return
@@ -1894,9 +1914,14 @@ class BuscaBoletoApp:
                     zip_nome = f"{prefixo}_{identificador}_{data_formatada}.zip"
                     zip_path = os.path.join(self.ftp_client.pasta_download, zip_nome)
                     
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    # PDFs já são compactados internamente: armazena sem recompactar.
+                    # Os demais (XML) usam deflate rápido (nível 1).
+                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
                         for arquivo in todos_arquivos:
-                            zipf.write(arquivo, os.path.basename(arquivo))
+                            if arquivo.lower().endswith('.pdf'):
+                                zipf.write(arquivo, os.path.basename(arquivo), compress_type=zipfile.ZIP_STORED)
+                            else:
+                                zipf.write(arquivo, os.path.basename(arquivo))
                     
                     # Remove os arquivos individuais após criar o ZIP (exceto XMLs que já existiam)
                     for arquivo in arquivos_baixados:
@@ -1932,12 +1957,12 @@ class BuscaBoletoApp:
             
             self.atualizar_status(f"ZIP criado: {zip_path}")
             
-            if messagebox.askyesno(
+            self._perguntar_abrir_async(
                 "Download Concluído",
                 f"{msg}\n\nArquivo ZIP criado: {os.path.basename(zip_path)}\n\n"
-                f"Salvo em: {zip_path}\n\nDeseja abrir o arquivo ZIP?"
-            ):
-                self.abrir_arquivo(zip_path)
+                f"Salvo em: {zip_path}\n\nDeseja abrir o arquivo ZIP?",
+                lambda: self.abrir_arquivo(zip_path)
+            )
         else:
             self.atualizar_status("Erro no download")
             erro_detalhes = "\n".join(erros[:5])  # Mostra até 5 erros
@@ -1954,26 +1979,65 @@ class BuscaBoletoApp:
             self.atualizar_status(f"Boleto baixado: {resultado}")
             
             # Pergunta se deseja abrir o arquivo
-            if messagebox.askyesno(
+            self._perguntar_abrir_async(
                 "Download Concluído",
                 f"Boleto '{nome}' baixado com sucesso!\n\n"
                 f"Salvo em: {resultado}\n\n"
-                "Deseja abrir o arquivo?"
-            ):
-                self.abrir_arquivo(resultado)
+                "Deseja abrir o arquivo?",
+                lambda: self.abrir_arquivo(resultado)
+            )
         else:
             self.atualizar_status(f"Erro no download: {resultado}")
             messagebox.showerror("Erro", f"Erro ao baixar boleto:\n{resultado}")
     
+    def _perguntar_abrir_async(self, titulo: str, mensagem: str, ao_confirmar):
+        """
+        Pergunta se deseja abrir um arquivo sem bloquear o loop do Tkinter.
+        
+        Diferente de messagebox.askyesno, a janela não é modal: callbacks
+        agendados com root.after (status, progresso de outros downloads)
+        continuam sendo processados enquanto a pergunta está aberta.
+        
+        Args:
+            titulo: Título da janela.
+            mensagem: Texto da pergunta.
+            ao_confirmar: Função chamada se o usuário clicar em "Sim".
+        """
+        janela = tk.Toplevel(self.root)
+        janela.title(titulo)
+        janela.resizable(False, False)
+        janela.transient(self.root)
+        
+        frame = ttk.Frame(janela, padding=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(frame, text=mensagem, justify=tk.LEFT, wraplength=420).pack(pady=(0, 15))
+        
+        frame_botoes = ttk.Frame(frame)
+        frame_botoes.pack()
+        
+        def confirmar():
+            janela.destroy()
+            ao_confirmar()
+        
+        btn_sim = ttk.Button(frame_botoes, text="Sim", command=confirmar)
+        btn_sim.pack(side=tk.LEFT, padx=5)
+        ttk.Button(frame_botoes, text="Não", command=janela.destroy).pack(side=tk.LEFT, padx=5)
+        
+        # Centraliza sobre a janela principal
+        janela.update_idletasks()
+        x = self.root.winfo_x() + (self.root.winfo_width() // 2) - (janela.winfo_width() // 2)
+        y = self.root.winfo_y() + (self.root.winfo_height() // 2) - (janela.winfo_height() // 2)
+        janela.geometry(f"+{x}+{y}")
+        
+        janela.bind('<Return>', lambda e: confirmar())
+        janela.bind('<Escape>', lambda e: janela.destroy())
+        btn_sim.focus_set()
+    
     def abrir_arquivo(self, caminho: str):
         """Abre um arquivo com o programa padrão do sistema."""
         try:
-            if sys.platform == 'win32':
-                os.startfile(caminho)
-            elif sys.platform == 'darwin':
-                subprocess.call(['open', caminho])
-            else:
-                subprocess.call(['xdg-open', caminho])
+            _abrir_com_sistema(caminho)
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao abrir arquivo: {e}")
     
@@ -1990,19 +2054,14 @@ class BuscaBoletoApp:
             
             # Abre no explorador
             caminho_absoluto = os.path.abspath(pasta)
-            
-            if sys.platform == 'win32':
-                os.startfile(caminho_absoluto)
-            elif sys.platform == 'darwin':
-                subprocess.call(['open', caminho_absoluto])
-            else:
-                subprocess.call(['xdg-open', caminho_absoluto])
+            _abrir_com_sistema(caminho_absoluto)
                 
         except Exception as e:
             messagebox.showerror("Erro", f"Erro ao abrir pasta: {e}")
     
     def on_closing(self):
         """Evento de fechamento da janela."""
+        self.encerrando.set()
         if self.conectado and self.ftp_client:
             self.ftp_client.desconectar()
         self.root.destroy()
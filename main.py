@@ -4,7 +4,12 @@ Busca Boleto FTP - Sistema para busca e download de boletos via FTP.
 Este é o arquivo principal para executar a aplicação.
 """
 
+from multiprocessing import freeze_support
+
 from interface import main
 
 if __name__ == "__main__":
+    # Necessário no executável do PyInstaller se algum código iniciar processos
+    # (ex.: pdf_utils.verificar_boletos_em_massa); sem efeito fora dele
+    freeze_support()
     main()
@@ -9,14 +9,49 @@ Este módulo permite:
 """
 
 import requests
-from requests_pkcs12 import Pkcs12Adapter
+from requests.adapters import HTTPAdapter
 import base64
+import functools
 import gzip
 import os
+import ssl
 import sys
-from configparser import ConfigParser
-from typing import Tuple, Optional
-from io import BytesIO
+import tempfile
+import threading
+from typing import Tuple, Optional, Union
+from urllib.parse import urlparse
+
+from config_utils import carregar_config
+
+# orjson é opcional: decodifica JSON em C diretamente dos bytes da resposta
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+# Erro de JSON inválido do decodificador em uso (subclasse de ValueError, assim
+# como erros de URL do requests, que não devem cair no mesmo tratamento)
+_JSONDecodeError = _json.JSONDecodeError
+
+
+# Assinatura (magic number) de arquivos PDF
+_PDF_MAGIC = b'%PDF'
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    """Adaptador HTTP que usa um SSLContext já carregado com o certificado do cliente."""
+    
+    def __init__(self, ssl_context: ssl.SSLContext, **kwargs):
+        self._ssl_context = ssl_context
+        super().__init__(**kwargs)
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+    
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs['ssl_context'] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
 
 
 def get_config_path():
@@ -63,12 +98,8 @@ class NFSeClient:
         if config_path is None:
             config_path = get_config_path()
         
-        self.config = ConfigParser()
-        config_loaded = False
-        
-        if os.path.exists(config_path):
-            self.config.read(config_path, encoding='utf-8')
-            config_loaded = True
+        self.config = carregar_config(config_path)
+        config_loaded = os.path.exists(config_path)
         
         # Configurações de endpoints
         self.endpoint_iddps = self.config.get('ENDPOINTS', 'endpoint_nfse_iddps', fallback='').strip('"') if config_loaded else ''
@@ -89,6 +120,12 @@ class NFSeClient:
         # Sessão HTTP com certificado (será criada sob demanda)
         self._session: Optional[requests.Session] = None
         
+        # Chave e certificados do PFX já decifrados (carregados sob demanda)
+        self._pfx_material: Optional[tuple] = None
+        
+        # Protege a criação da sessão quando há consultas em paralelo
+        self._session_lock = threading.Lock()
+        
         # Criar pasta de download se não existir
         if not os.path.exists(self.pasta_download):
             os.makedirs(self.pasta_download)
@@ -106,6 +143,19 @@ class NFSeClient:
         if self._session is not None:
             return self._session
         
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._criar_session()
+        
+        return self._session
+    
+    def _criar_session(self) -> requests.Session:
+        """
+        Cria a sessão HTTP com o certificado montado nos hosts dos endpoints.
+        
+        Returns:
+            Sessão requests configurada.
+        """
         # Verifica se o certificado está configurado
         if not self.certificado_path:
             raise Exception(
@@ -123,8 +173,11 @@ class NFSeClient:
                 "Verifique o caminho configurado em [CERTIFICADO] no config.ini."
             )
         
+        # Decifra o PFX (reaproveita o resultado de verificar_certificado, se houver)
+        adaptador = _SSLContextAdapter(self._criar_ssl_context())
+        
         # Cria sessão com certificado PKCS12
-        self._session = requests.Session()
+        session = requests.Session()
         
         # Monta o adaptador com o certificado para os hosts dos endpoints
         # Extrai os hosts dos endpoints
@@ -132,34 +185,90 @@ class NFSeClient:
         
         if self.endpoint_iddps:
             # Extrai o base URL (https://host)
-            from urllib.parse import urlparse
             parsed = urlparse(self.endpoint_iddps)
             base_url = f"{parsed.scheme}://{parsed.netloc}"
             hosts_to_mount.add(base_url)
         
         if self.endpoint_chave_acesso:
-            from urllib.parse import urlparse
             parsed = urlparse(self.endpoint_chave_acesso)
             base_url = f"{parsed.scheme}://{parsed.netloc}"
             hosts_to_mount.add(base_url)
         
         if self.endpoint_pdf:
-            from urllib.parse import urlparse
             parsed = urlparse(self.endpoint_pdf)
             base_url = f"{parsed.scheme}://{parsed.netloc}"
             hosts_to_mount.add(base_url)
         
-        # Monta o adaptador PKCS12 para cada host
+        # Monta o mesmo adaptador para cada host
         for host in hosts_to_mount:
-            self._session.mount(
-                host,
-                Pkcs12Adapter(
-                    pkcs12_filename=self.certificado_path,
-                    pkcs12_password=self.certificado_senha
-                )
+            session.mount(host, adaptador)
+        
+        return session
+    
+    def _carregar_pfx(self) -> tuple:
+        """
+        Carrega e decifra o certificado PFX uma única vez.
+        
+        Returns:
+            Tupla (private_key, certificate, additional_certs).
+        
+        Raises:
+            Exception: Se o arquivo não puder ser lido ou a senha estiver incorreta.
+        """
+        if self._pfx_material is None:
+            from cryptography.hazmat.primitives.serialization import pkcs12
+            
+            with open(self.certificado_path, 'rb') as f:
+                pfx_data = f.read()
+            
+            self._pfx_material = pkcs12.load_key_and_certificates(
+                pfx_data,
+                self.certificado_senha.encode() if self.certificado_senha else None
             )
         
-        return self._session
+        return self._pfx_material
+    
+    def _criar_ssl_context(self) -> ssl.SSLContext:
+        """
+        Cria o SSLContext com a chave e os certificados do PFX.
+        
+        O ssl só carrega certificados de arquivo, então o PEM é gravado em um
+        temporário (com a chave cifrada por uma senha descartável) e removido
+        logo após o carregamento.
+        
+        Returns:
+            SSLContext pronto para autenticação de cliente.
+        """
+        from cryptography.hazmat.primitives import serialization
+        
+        private_key, certificate, additional_certs = self._carregar_pfx()
+        if private_key is None or certificate is None:
+            raise Exception("Certificado não contém chave privada ou certificado válidos")
+        
+        senha_temp = os.urandom(16).hex().encode()
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(senha_temp)
+        )
+        pem += certificate.public_bytes(serialization.Encoding.PEM)
+        for cert in additional_certs or []:
+            pem += cert.public_bytes(serialization.Encoding.PEM)
+        
+        context = ssl.create_default_context()
+        
+        with tempfile.NamedTemporaryFile(suffix='.pem', delete=False) as tmp:
+            tmp.write(pem)
+            tmp_path = tmp.name
+        try:
+            context.load_cert_chain(tmp_path, password=senha_temp)
+        finally:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        
+        return context
     
     def verificar_certificado(self) -> Tuple[bool, str]:
         """
@@ -176,17 +285,8 @@ class NFSeClient:
         
         # Tenta carregar o certificado para verificar se a senha está correta
         try:
-            from cryptography.hazmat.primitives.serialization import pkcs12
-            from cryptography import x509
-            
-            with open(self.certificado_path, 'rb') as f:
-                pfx_data = f.read()
-            
-            # Tenta carregar com a senha
-            private_key, certificate, additional_certs = pkcs12.load_key_and_certificates(
-                pfx_data,
-                self.certificado_senha.encode() if self.certificado_senha else None
-            )
+            # Tenta carregar com a senha (fica em cache para _get_session)
+            private_key, certificate, additional_certs = self._carregar_pfx()
             
             if certificate:
                 # Extrai informações do certificado
@@ -213,8 +313,14 @@ class NFSeClient:
         Exemplo:
             "29" -> "00000000000000029"
         """
+        return self._formatar_numero(str(numero))
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=8192)
+    def _formatar_numero(numero: str) -> str:
+        """Limpa e formata o número (memoizado, sem prender a instância no cache)."""
         # Remove caracteres não numéricos
-        numero_limpo = ''.join(filter(str.isdigit, str(numero)))
+        numero_limpo = ''.join(filter(str.isdigit, numero))
         
         if not numero_limpo:
             return ""
@@ -263,12 +369,12 @@ class NFSeClient:
             # Obtém sessão com certificado digital
             session = self._get_session()
             
-            url = f"{self.endpoint_iddps}{id_dps}"
+            url = self.endpoint_iddps + id_dps
             
             response = session.get(url, timeout=self.timeout)
             
             if response.status_code == 200:
-                dados = response.json()
+                dados = _json.loads(response.content)
                 
                 if 'chaveAcesso' in dados:
                     return True, dados['chaveAcesso'], id_dps
@@ -287,12 +393,12 @@ class NFSeClient:
             return False, f"Timeout ao consultar endpoint (>{self.timeout}s).", id_dps
         except requests.exceptions.ConnectionError as e:
             return False, f"Erro de conexão ao servidor SEFIN: {str(e)}", id_dps
-        except requests.exceptions.JSONDecodeError:
+        except _JSONDecodeError:
             return False, f"Resposta inválida (não é JSON): {response.text[:200]}", id_dps
         except Exception as e:
             return False, f"Erro ao buscar chave de acesso: {str(e)}", id_dps
     
-    def consultar_nfse(self, chave_acesso: str) -> Tuple[bool, str]:
+    def consultar_nfse(self, chave_acesso: str) -> Tuple[bool, Union[bytes, str]]:
         """
         Consulta a NFSe pela chave de acesso e obtém o XML.
         
@@ -300,7 +406,8 @@ class NFSeClient:
             chave_acesso: Chave de acesso da NFSe.
             
         Returns:
-            Tupla com (sucesso: bool, xml_decodificado ou mensagem_erro: str)
+            Tupla com (sucesso: bool, xml_decodificado: bytes ou mensagem_erro: str)
+            O XML é devolvido em bytes UTF-8, como veio da API.
         """
         if not chave_acesso:
             return False, "Chave de acesso não informada."
@@ -312,12 +419,12 @@ class NFSeClient:
             # Obtém sessão com certificado digital
             session = self._get_session()
             
-            url = f"{self.endpoint_chave_acesso}{chave_acesso}"
+            url = self.endpoint_chave_acesso + chave_acesso
             
             response = session.get(url, timeout=self.timeout)
             
             if response.status_code == 200:
-                dados = response.json()
+                dados = _json.loads(response.content)
                 
                 if 'nfseXmlGZipB64' in dados:
                     xml_gzip_b64 = dados['nfseXmlGZipB64']
@@ -338,12 +445,12 @@ class NFSeClient:
             return False, f"Timeout ao consultar NFSe (>{self.timeout}s)."
         except requests.exceptions.ConnectionError as e:
             return False, f"Erro de conexão ao servidor SEFIN: {str(e)}"
-        except requests.exceptions.JSONDecodeError:
+        except _JSONDecodeError:
             return False, f"Resposta inválida (não é JSON): {response.text[:200]}"
         except Exception as e:
             return False, f"Erro ao consultar NFSe: {str(e)}"
     
-    def _decodificar_gzip_base64(self, dados_codificados: str) -> str:
+    def _decodificar_gzip_base64(self, dados_codificados: str) -> bytes:
         """
         Decodifica dados em formato GZip Base64.
         
@@ -351,22 +458,15 @@ class NFSeClient:
             dados_codificados: String codificada em GZip + Base64.
             
         Returns:
-            Dados decodificados como string.
+            Dados decodificados em bytes (sem conversão para string).
         """
         try:
-            # Decodifica Base64
-            dados_gzip = base64.b64decode(dados_codificados)
-            
-            # Descompacta GZip
-            with gzip.GzipFile(fileobj=BytesIO(dados_gzip)) as f:
-                dados_decodificados = f.read()
-            
-            # Converte para string (UTF-8)
-            return dados_decodificados.decode('utf-8')
+            # Decodifica Base64 e descompacta GZip
+            return gzip.decompress(base64.b64decode(dados_codificados))
         except Exception as e:
             raise Exception(f"Erro ao decodificar dados GZip Base64: {str(e)}")
     
-    def buscar_xml_nfse(self, numero_nfse: str) -> Tuple[bool, str, dict]:
+    def buscar_xml_nfse(self, numero_nfse: str) -> Tuple[bool, Union[bytes, str], dict]:
         """
         Busca o XML completo da NFSe pelo número.
         
@@ -378,7 +478,7 @@ class NFSeClient:
             numero_nfse: Número da NFSe.
             
         Returns:
-            Tupla com (sucesso: bool, xml ou mensagem_erro: str, info: dict)
+            Tupla com (sucesso: bool, xml: bytes ou mensagem_erro: str, info: dict)
             O dict info contém: id_dps, chave_acesso (quando disponíveis)
         """
         info = {
@@ -405,12 +505,12 @@ class NFSeClient:
         
         return True, xml_ou_erro, info
     
-    def salvar_xml(self, xml_content: str, numero_nfse: str, pasta_destino: str = None) -> Tuple[bool, str]:
+    def salvar_xml(self, xml_content: Union[bytes, str], numero_nfse: str, pasta_destino: str = None) -> Tuple[bool, str]:
         """
         Salva o XML da NFSe em um arquivo.
         
         Args:
-            xml_content: Conteúdo XML da NFSe.
+            xml_content: Conteúdo XML da NFSe (bytes UTF-8; str é codificada).
             numero_nfse: Número da NFSe (usado no nome do arquivo).
             pasta_destino: Pasta onde salvar (usa pasta_download se não informada).
             
@@ -421,15 +521,17 @@ class NFSeClient:
             pasta = pasta_destino or self.pasta_download
             
             # Cria pasta se não existir
-            if not os.path.exists(pasta):
-                os.makedirs(pasta)
+            os.makedirs(pasta, exist_ok=True)
             
             # Nome do arquivo
             nome_arquivo = f"NFSe_{numero_nfse}.xml"
             caminho_completo = os.path.join(pasta, nome_arquivo)
             
-            # Salva o arquivo
-            with open(caminho_completo, 'w', encoding='utf-8') as f:
+            if isinstance(xml_content, str):
+                xml_content = xml_content.encode('utf-8')
+            
+            # Salva o arquivo (bytes direto, sem recodificar)
+            with open(caminho_completo, 'wb', buffering=1 << 16) as f:
                 f.write(xml_content)
             
             return True, caminho_completo
@@ -489,37 +591,55 @@ class NFSeClient:
             # Obtém sessão com certificado digital
             session = self._get_session()
             
-            url = f"{self.endpoint_pdf}{chave_acesso}"
+            url = self.endpoint_pdf + chave_acesso
             
-            response = session.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                # Verifica se o conteúdo é PDF
-                content_type = response.headers.get('Content-Type', '')
-                if 'application/pdf' in content_type or response.content[:4] == b'%PDF':
-                    # Salva o PDF
-                    pasta = pasta_destino or self.pasta_download
-                    
-                    if not os.path.exists(pasta):
-                        os.makedirs(pasta)
-                    
-                    nome_arquivo = f"NFSe_{numero_nfse}.pdf"
-                    caminho_completo = os.path.join(pasta, nome_arquivo)
-                    
-                    with open(caminho_completo, 'wb') as f:
-                        f.write(response.content)
+            # stream=True grava o PDF em blocos, sem manter o corpo inteiro em memória
+            with session.get(url, timeout=self.timeout, stream=True,
+                             headers={'Accept': 'application/pdf'}) as response:
+                
+                if response.status_code == 200:
+                    # Verifica se o conteúdo é PDF: pelo Content-Type ou, se este
+                    # for ambíguo, lendo só os bytes da assinatura do arquivo
+                    content_type = response.headers.get('Content-Type', '')
+                    inicio = b''
+                    eh_pdf = 'application/pdf' in content_type
+                    if not eh_pdf:
+                        inicio = response.raw.read(len(_PDF_MAGIC), decode_content=True)
+                        eh_pdf = inicio == _PDF_MAGIC
                     
-                    return True, caminho_completo
+                    if eh_pdf:
+                        # Salva o PDF
+                        pasta = pasta_destino or self.pasta_download
+                        
+                        os.makedirs(pasta, exist_ok=True)
+                        
+                        nome_arquivo = f"NFSe_{numero_nfse}.pdf"
+                        caminho_completo = os.path.join(pasta, nome_arquivo)
+                        
+                        try:
+                            with open(caminho_completo, 'wb') as f:
+                                f.write(inicio)
+                                for bloco in response.iter_content(chunk_size=1 << 16):
+                                    f.write(bloco)
+                        except Exception:
+                            # Não deixa PDF incompleto na pasta
+                            try:
+                                os.remove(caminho_completo)
+                            except OSError:
+                                pass
+                            raise
+                        
+                        return True, caminho_completo
+                    else:
+                        return False, f"Resposta não é PDF. Content-Type: {content_type}"
+                elif response.status_code == 404:
+                    return False, f"PDF não encontrado para a chave: {chave_acesso}"
+                elif response.status_code == 403:
+                    return False, f"Acesso negado (403). Verifique se o certificado digital está correto."
+                elif response.status_code == 401:
+                    return False, f"Não autorizado (401). Certificado digital inválido ou expirado."
                 else:
-                    return False, f"Resposta não é PDF. Content-Type: {content_type}"
-            elif response.status_code == 404:
-                return False, f"PDF não encontrado para a chave: {chave_acesso}"
-            elif response.status_code == 403:
-                return False, f"Acesso negado (403). Verifique se o certificado digital está correto."
-            elif response.status_code == 401:
-                return False, f"Não autorizado (401). Certificado digital inválido ou expirado."
-            else:
-                return False, f"Erro HTTP {response.status_code}: {response.text[:200]}"
+                    return False, f"Erro HTTP {response.status_code}: {response.text[:200]}"
                 
         except requests.exceptions.Timeout:
             return False, f"Timeout ao baixar PDF (>{self.timeout}s)."
@@ -541,6 +661,8 @@ def carregar_configuracao_endpoints(config_path: str = "config.ini") -> dict:
     Returns:
         Dicionário com as configurações de endpoints.
     """
+    from configparser import ConfigParser
+    
     config = ConfigParser()
     config.read(config_path, encoding='utf-8')
     
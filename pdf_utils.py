@@ -1,52 +1,281 @@
 """
-Utilitário para extração de dados de boletos PDF usando pdfplumber e regex.
+Utilitário para extração de dados de boletos PDF usando PyMuPDF/pdfplumber e regex.
 """
 
+import os
 import re
-from typing import Optional, Dict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Optional, Dict, List
 import pdfplumber
 
+# PyMuPDF é opcional: extrai texto em C, bem mais rápido que o pdfplumber.
+# "pymupdf" é o nome atual do módulo; "fitz" (obsoleto) só em versões < 1.24.3.
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+
+# Separadores da linha digitável (pontos e espaços)
+_SEPARADORES_LINHA = re.compile(r'[\.\s]')
+
+# Bytes que não são dígitos ASCII (removidos com bytes.translate)
+_BYTES_NAO_DIGITOS = bytes(c for c in range(256) if not 0x30 <= c <= 0x39)
+
+
+def _somente_digitos(texto: str) -> bytes:
+    """
+    Remove todos os caracteres que não são dígitos.
+    
+    Trabalha em bytes (1 byte por caractere): o texto é codificado em Latin-1,
+    descartando o que estiver fora dele (travessões, aspas tipográficas), e o
+    bytes.translate remove o restante numa única passada.
+    
+    Args:
+        texto: Texto de entrada.
+        
+    Returns:
+        Apenas os dígitos do texto, na ordem original, em bytes ASCII.
+    """
+    return texto.encode('latin-1', 'ignore').translate(None, _BYTES_NAO_DIGITOS)
+
 
 class BoletoExtractor:
-    """Extrai informações de boletos em PDF."""
+    """
+    Extrai informações de boletos em PDF.
+    
+    O PDF é aberto uma vez e fica aberto entre as extrações; use o extrator
+    com "with" ou chame close() ao terminar.
+    """
     
-    # Padrões regex para identificar dados do boleto
+    # Padrões regex para identificar dados do boleto (compilados na importação)
     PATTERNS = {
-        # Linha digitável (47 dígitos com espaços)
-        'linha_digitavel': r'\d{5}[\.\s]?\d{5}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d{5}[\.\s]?\d{6}[\.\s]?\d{1}[\.\s]?\d{14}',
+        # Linha digitável (47 dígitos com espaços), delimitada por \b e só com dígitos ASCII
+        # para limitar o retrocesso em páginas cheias de números. Os separadores seguem
+        # o \s Unicode (inclui o espaço não separável \xa0 comum em PDFs).
+        'linha_digitavel': re.compile(r'\b[0-9]{5}[.\s]?[0-9]{5}[.\s]?[0-9]{5}[.\s]?[0-9]{6}[.\s]?[0-9]{5}[.\s]?[0-9]{6}[.\s]?[0-9][.\s]?[0-9]{14}\b'),
         
         # Código de barras (44 dígitos)
-        'codigo_barras': r'\d{44}',
+        'codigo_barras': re.compile(r'\d{44}'),
         
         # Valor do boleto (R$ X.XXX,XX)
-        'valor': r'R\$\s*[\d\.,]+',
+        'valor': re.compile(r'R\$\s*[\d\.,]+'),
         
         # Data de vencimento (DD/MM/AAAA)
-        'vencimento': r'\d{2}/\d{2}/\d{4}',
+        'vencimento': re.compile(r'\d{2}/\d{2}/\d{4}'),
         
         # CNPJ (XX.XXX.XXX/XXXX-XX)
-        'cnpj': r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}',
+        'cnpj': re.compile(r'\d{2}\.\d{3}\.\d{3}/\d{4}-\d{2}'),
         
         # CPF (XXX.XXX.XXX-XX)
-        'cpf': r'\d{3}\.\d{3}\.\d{3}-\d{2}',
+        'cpf': re.compile(r'\d{3}\.\d{3}\.\d{3}-\d{2}'),
         
         # Nosso número (varia por banco)
-        'nosso_numero': r'[Nn]osso\s*[Nn][uú]mero[:\s]*(\d+[\d\.\-/]*\d*)',
+        'nosso_numero': re.compile(r'[Nn]osso\s*[Nn][uú]mero[:\s]*(\d+[\d\.\-/]*\d*)', re.IGNORECASE),
         
         # Número do documento
-        'numero_documento': r'[Nn][uú]mero\s*[Dd]o\s*[Dd]ocumento[:\s]*(\d+)',
+        'numero_documento': re.compile(r'[Nn][uú]mero\s*[Dd]o\s*[Dd]ocumento[:\s]*(\d+)'),
     }
     
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, max_pages: Optional[int] = 3):
         """
         Inicializa o extrator com o caminho do PDF.
         
         Args:
             pdf_path: Caminho para o arquivo PDF do boleto.
+            max_pages: Páginas iniciais lidas, junto com a última, na busca do valor
+                (última ocorrência); as do meio só são lidas se não houver nenhum
+                valor nelas. None procura o valor no documento inteiro. Os demais
+                campos sempre usam a primeira ocorrência na ordem do documento.
         """
         self.pdf_path = pdf_path
+        self.max_pages = max_pages
         self.texto_completo = ""
         self.dados_extraidos: Dict[str, Optional[str]] = {}
+        
+        # Apenas os dígitos do texto (calculado uma vez, sob demanda)
+        self._texto_digitos: Optional[bytes] = None
+        
+        # Campos já procurados no texto (encontrados ou não)
+        self._campos_verificados = set()
+        
+        # Documento aberto (fitz.Document ou pdfplumber.PDF), mantido até close()
+        self._doc = None
+        
+        # Texto de cada página já lida ({indice: texto}) e total de páginas,
+        # reaproveitados pelas extrações seguintes
+        self._textos_paginas: Dict[int, str] = {}
+        self._total_paginas: Optional[int] = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+    
+    def close(self):
+        """Fecha o documento PDF, se estiver aberto."""
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+    
+    def reset(self, pdf_path: str = None):
+        """
+        Limpa o texto e os dados em cache para reutilizar o extrator.
+        
+        Args:
+            pdf_path: Novo PDF a ser lido (opcional; mantém o atual se omitido).
+        """
+        if pdf_path is not None and pdf_path != self.pdf_path:
+            self.close()
+            self.pdf_path = pdf_path
+            self._textos_paginas = {}
+            self._total_paginas = None
+        self.texto_completo = ""
+        self.dados_extraidos = {}
+        self._texto_digitos = None
+        self._campos_verificados = set()
+    
+    def _abrir_documento(self):
+        """
+        Abre o PDF uma única vez e reaproveita o documento nas leituras seguintes.
+        
+        Returns:
+            fitz.Document (PyMuPDF) ou pdfplumber.PDF.
+        """
+        if self._doc is None:
+            if fitz is not None:
+                self._doc = fitz.open(self.pdf_path)
+            else:
+                self._doc = pdfplumber.open(self.pdf_path)
+        return self._doc
+    
+    def _contar_paginas(self) -> int:
+        """
+        Retorna o total de páginas do PDF (contado uma vez).
+        
+        Returns:
+            Número de páginas.
+        """
+        if self._total_paginas is None:
+            doc = self._abrir_documento()
+            self._total_paginas = len(doc) if fitz is not None else len(doc.pages)
+        return self._total_paginas
+    
+    def _texto_pagina(self, indice: int) -> str:
+        """
+        Retorna o texto de uma página, extraindo-o só na primeira leitura.
+        
+        Args:
+            indice: Índice da página.
+        
+        Returns:
+            Texto da página (vazio se não houver texto).
+        """
+        texto = self._textos_paginas.get(indice)
+        if texto is None:
+            doc = self._abrir_documento()
+            if fitz is not None:
+                texto = doc[indice].get_text("text")
+            else:
+                pagina = doc.pages[indice]
+                texto = pagina.extract_text() or ""
+                # O pdfplumber guarda o layout de cada página até o PDF ser fechado;
+                # libera logo após a leitura, ficando só com o texto
+                pagina.close()
+            self._textos_paginas[indice] = texto
+        return texto
+    
+    def _iter_textos_paginas(self, inicio: int = 0, fim: Optional[int] = None):
+        """
+        Lê o PDF página a página, reaproveitando as páginas já lidas.
+        
+        Args:
+            inicio: Índice da primeira página lida.
+            fim: Índice após a última página lida (None: até o fim).
+        
+        Yields:
+            Texto de cada página que tenha texto.
+        """
+        total = self._contar_paginas()
+        fim = total if fim is None else min(fim, total)
+        
+        for indice in range(inicio, fim):
+            texto = self._texto_pagina(indice)
+            if texto:
+                yield texto
+    
+    def _iter_textos_busca(self, faixas: list = ((0, None),)):
+        """
+        Textos onde os padrões são procurados.
+        
+        Usa o texto completo se já foi extraído (tratado como uma única página);
+        senão lê o PDF página a página, sem juntar tudo em memória, e para quando
+        o chamador encerra a busca.
+        
+        Args:
+            faixas: Faixas (inicio, fim) de páginas lidas, na ordem de leitura.
+        
+        Yields:
+            Texto completo ou texto de cada página.
+        """
+        if self.texto_completo:
+            yield self.texto_completo
+            return
+        
+        try:
+            for inicio, fim in faixas:
+                yield from self._iter_textos_paginas(inicio, fim)
+        except Exception as e:
+            print(f"Erro ao extrair texto do PDF: {e}")
+    
+    def _fases_leitura_valor(self) -> list:
+        """
+        Páginas na ordem de leitura do valor, em duas fases: primeiro as max_pages
+        iniciais e a última (faturas costumam trazer o boleto no fim); depois as
+        páginas do meio, lidas só se não houver valor nas primeiras.
+        
+        Returns:
+            Lista de fases; cada fase é uma lista de faixas (inicio, fim).
+        """
+        if self.texto_completo or self.max_pages is None:
+            return [[(0, None)]]
+        
+        try:
+            total = self._contar_paginas()
+        except Exception:
+            # O erro é informado na leitura das páginas
+            return [[(0, None)]]
+        
+        if total <= self.max_pages + 1:
+            return [[(0, None)]]
+        return [
+            [(0, self.max_pages), (total - 1, total)],
+            [(self.max_pages, total - 1)],
+        ]
+    
+    def _buscar_primeiro(self, campo: str) -> Optional[re.Match]:
+        """
+        Procura a primeira ocorrência de um padrão, página a página, na ordem do
+        documento.
+        
+        Args:
+            campo: Chave do padrão em PATTERNS.
+            
+        Returns:
+            Primeiro match encontrado ou None.
+        """
+        padrao = self.PATTERNS[campo]
+        for texto in self._iter_textos_busca():
+            match = padrao.search(texto)
+            if match:
+                return match
+        return None
     
     def extrair_texto(self) -> str:
         """
@@ -56,15 +285,11 @@ class BoletoExtractor:
             Texto completo do PDF.
         """
         try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                textos = []
-                for pagina in pdf.pages:
-                    texto = pagina.extract_text()
-                    if texto:
-                        textos.append(texto)
-                
-                self.texto_completo = "\n".join(textos)
-                return self.texto_completo
+            self.texto_completo = "\n".join(self._iter_textos_paginas())
+            self._texto_digitos = None
+            self.dados_extraidos = {}
+            self._campos_verificados = set()
+            return self.texto_completo
         except Exception as e:
             print(f"Erro ao extrair texto do PDF: {e}")
             return ""
@@ -76,14 +301,16 @@ class BoletoExtractor:
         Returns:
             Linha digitável encontrada ou None.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
+        if 'linha_digitavel' in self._campos_verificados:
+            return self.dados_extraidos.get('linha_digitavel')
+        
+        self._campos_verificados.add('linha_digitavel')
         
         # Procura padrão de linha digitável
-        match = re.search(self.PATTERNS['linha_digitavel'], self.texto_completo)
+        match = self._buscar_primeiro('linha_digitavel')
         if match:
             # Remove espaços e pontos
-            linha = re.sub(r'[\.\s]', '', match.group())
+            linha = _SEPARADORES_LINHA.sub('', match.group())
             self.dados_extraidos['linha_digitavel'] = linha
             return linha
         
@@ -96,13 +323,24 @@ class BoletoExtractor:
         Returns:
             Valor encontrado ou None.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
-        
-        matches = re.findall(self.PATTERNS['valor'], self.texto_completo)
-        if matches:
-            # Geralmente o último valor é o total do boleto
-            valor = matches[-1] if len(matches) > 1 else matches[0]
+        if 'valor' in self._campos_verificados:
+            return self.dados_extraidos.get('valor')
+        
+        self._campos_verificados.add('valor')
+        
+        # Geralmente o último valor é o total do boleto: guarda só a última ocorrência
+        # das primeiras páginas e da última, seguindo para as do meio apenas se não
+        # houver nenhuma
+        ultimo = None
+        for fase in self._fases_leitura_valor():
+            for texto in self._iter_textos_busca(fase):
+                for match in self.PATTERNS['valor'].finditer(texto):
+                    ultimo = match
+            if ultimo:
+                break
+        
+        if ultimo:
+            valor = ultimo.group()
             self.dados_extraidos['valor'] = valor
             return valor
         
@@ -115,13 +353,15 @@ class BoletoExtractor:
         Returns:
             Data de vencimento encontrada ou None.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
+        if 'vencimento' in self._campos_verificados:
+            return self.dados_extraidos.get('vencimento')
+        
+        self._campos_verificados.add('vencimento')
         
-        matches = re.findall(self.PATTERNS['vencimento'], self.texto_completo)
-        if matches:
-            # A primeira data geralmente é o vencimento
-            vencimento = matches[0]
+        # A primeira data geralmente é o vencimento
+        match = self._buscar_primeiro('vencimento')
+        if match:
+            vencimento = match.group()
             self.dados_extraidos['vencimento'] = vencimento
             return vencimento
         
@@ -134,10 +374,12 @@ class BoletoExtractor:
         Returns:
             Nosso número encontrado ou None.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
+        if 'nosso_numero' in self._campos_verificados:
+            return self.dados_extraidos.get('nosso_numero')
         
-        match = re.search(self.PATTERNS['nosso_numero'], self.texto_completo, re.IGNORECASE)
+        self._campos_verificados.add('nosso_numero')
+        
+        match = self._buscar_primeiro('nosso_numero')
         if match:
             nosso_numero = match.group(1).strip()
             self.dados_extraidos['nosso_numero'] = nosso_numero
@@ -152,10 +394,12 @@ class BoletoExtractor:
         Returns:
             CNPJ encontrado ou None.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
+        if 'cnpj' in self._campos_verificados:
+            return self.dados_extraidos.get('cnpj')
+        
+        self._campos_verificados.add('cnpj')
         
-        match = re.search(self.PATTERNS['cnpj'], self.texto_completo)
+        match = self._buscar_primeiro('cnpj')
         if match:
             cnpj = match.group()
             self.dados_extraidos['cnpj'] = cnpj
@@ -170,9 +414,8 @@ class BoletoExtractor:
         Returns:
             Dicionário com todos os dados extraídos.
         """
-        if not self.texto_completo:
-            self.extrair_texto()
-        
+        # Cada campo usa o próprio padrão compilado; os de primeira ocorrência
+        # param na primeira página em que aparecem
         self.extrair_linha_digitavel()
         self.extrair_valor()
         self.extrair_vencimento()
@@ -195,10 +438,45 @@ class BoletoExtractor:
             self.extrair_texto()
         
         # Remove caracteres não numéricos para comparação
-        numero_limpo = re.sub(r'[^\d]', '', numero)
-        texto_limpo = re.sub(r'[^\d]', '', self.texto_completo)
+        numero_limpo = _somente_digitos(numero)
+        if self._texto_digitos is None:
+            self._texto_digitos = _somente_digitos(self.texto_completo)
+        
+        return numero_limpo in self._texto_digitos
+    
+    def contem_numero(self, numero: str) -> bool:
+        """
+        Verifica se um número existe no PDF, parando na primeira página em que aparecer.
+        
+        Diferente de buscar_numero_no_texto, não extrai o documento inteiro
+        quando o número está nas primeiras páginas.
+        
+        Args:
+            numero: Número a ser buscado.
+            
+        Returns:
+            True se encontrado, False caso contrário.
+        """
+        # Texto já extraído: usa os dígitos em cache
+        if self.texto_completo:
+            return self.buscar_numero_no_texto(numero)
         
-        return numero_limpo in texto_limpo
+        numero_limpo = _somente_digitos(numero)
+        if not numero_limpo:
+            return True
+        
+        try:
+            # Guarda o final da página anterior para números que cruzam a quebra de página
+            cauda = b''
+            for texto in self._iter_textos_paginas():
+                digitos = cauda + _somente_digitos(texto)
+                if numero_limpo in digitos:
+                    return True
+                cauda = digitos[max(0, len(digitos) - len(numero_limpo) + 1):]
+            return False
+        except Exception as e:
+            print(f"Erro ao extrair texto do PDF: {e}")
+            return False
 
 
 def verificar_boleto_por_conteudo(pdf_path: str, numero_boleto: str) -> bool:
@@ -213,8 +491,8 @@ def verificar_boleto_por_conteudo(pdf_path: str, numero_boleto: str) -> bool:
         True se o número for encontrado no conteúdo do PDF.
     """
     try:
-        extractor = BoletoExtractor(pdf_path)
-        return extractor.buscar_numero_no_texto(numero_boleto)
+        with BoletoExtractor(pdf_path) as extractor:
+            return extractor.contem_numero(numero_boleto)
     except Exception as e:
         print(f"Erro ao verificar boleto: {e}")
         return False
@@ -230,8 +508,65 @@ def extrair_info_boleto(pdf_path: str) -> Dict[str, Optional[str]]:
     Returns:
         Dicionário com as informações extraídas.
     """
-    extractor = BoletoExtractor(pdf_path)
-    return extractor.extrair_todos_dados()
+    with BoletoExtractor(pdf_path) as extractor:
+        return extractor.extrair_todos_dados()
+
+
+def _tamanho_lote(total: int, workers: Optional[int]) -> int:
+    """
+    Calcula o chunksize do executor.map: ~4 lotes por processo, para dividir
+    lotes pequenos entre todos os processos e ainda reduzir a troca de
+    mensagens em lotes grandes.
+    
+    Args:
+        total: Quantidade de arquivos.
+        workers: Número de processos (None: número de núcleos).
+        
+    Returns:
+        Quantidade de arquivos enviada a um processo por vez.
+    """
+    workers = workers or os.cpu_count() or 1
+    return max(1, total // (workers * 4))
+
+
+def verificar_boletos_em_massa(pdf_paths: List[str], numero_boleto: str, workers: Optional[int] = None) -> Dict[str, bool]:
+    """
+    Verifica vários PDFs em paralelo, um processo por núcleo.
+    
+    A extração de texto é CPU-bound e presa ao GIL, por isso usa processos
+    em vez de threads.
+    
+    Args:
+        pdf_paths: Caminhos dos arquivos PDF.
+        numero_boleto: Número do boleto a ser verificado.
+        workers: Número de processos (padrão: número de núcleos).
+        
+    Returns:
+        Dicionário {caminho: True se o número foi encontrado}.
+    """
+    verificar = partial(verificar_boleto_por_conteudo, numero_boleto=numero_boleto)
+    
+    chunksize = _tamanho_lote(len(pdf_paths), workers)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(pdf_paths, executor.map(verificar, pdf_paths, chunksize=chunksize)))
+
+
+def extrair_info_boletos(pdf_paths: List[str], workers: Optional[int] = None) -> Dict[str, Dict[str, Optional[str]]]:
+    """
+    Extrai informações de vários boletos PDF em paralelo.
+    
+    Args:
+        pdf_paths: Caminhos dos arquivos PDF.
+        workers: Número de processos (padrão: número de núcleos).
+        
+    Returns:
+        Dicionário {caminho: informações extraídas}.
+    """
+    chunksize = _tamanho_lote(len(pdf_paths), workers)
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(pdf_paths, executor.map(extrair_info_boleto, pdf_paths, chunksize=chunksize)))
 
 
 # Exemplo de uso